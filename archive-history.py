@@ -0,0 +1,31 @@
+#!/usr/bin/python
+#
+# Move the rows closed more than <days> ago out of the bender tables (all
+# of them, or those named) in the SQL database named in bender.cf, into their
+# history - see archive() in bender_obj.py.  Selects "as of" a time still
+# find them there; the tables themselves keep only the rows valid lately.
+
+import sys
+import time
+import bender_obj as bender
+
+tables = {'hostgroups': bender.host_group,
+          'service_templates': bender.service_template,
+          'policy': bender.policy_group,
+          'sdp': bender.policy_render}
+
+if len(sys.argv) < 2 or not sys.argv[1].isdigit() or \
+   [name for name in sys.argv[2:] if name not in tables]:
+    print "Usage: archive-history <days> [%s ...]" % ('|'.join(sorted(tables)))
+    sys.exit(1)
+
+pol_db_cfg = bender.read_config("database", ['/etc/bender.cf', 'bender.cf'])
+# a csv: URI names a single file, not the four tables - archive those
+# with archive() and save() on each table
+if pol_db_cfg['uri'].split(':')[0] not in ('mysql', 'sqlite'):
+    print "archive-history: the database URI in bender.cf must be mysql: or sqlite:"
+    sys.exit(1)
+before = time.time() - int(sys.argv[1]) * 24 * 3600
+for name in sys.argv[2:] or sorted(tables):
+    table = tables[name](pol_db_cfg['uri'], name)
+    print name, table.archive(before)
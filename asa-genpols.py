@@ -57,8 +57,7 @@ asa_host_names = []
 for host_group_name in host_group_names_src.union(host_group_names_dst):
     if host_group_name not in asa_host_names:
         print "object-group network %s" % (host_group_name)
-        host_groups = h_groups.select(hg_name=host_group_name)
-        for h in host_groups:
+        for h in h_groups.iter_select(hg_name=host_group_name):
             print "\tnetwork-object host", h['hg_member']
 
 # now the "easy" part - rip through the policy line by line, printing it out
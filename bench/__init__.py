@@ -0,0 +1,8 @@
+"""Benchmarks for bender
+
+gen_data  - generate synthetic host group, service template and policy
+            tables (and an address book for them) at a configurable scale
+run_bench - time loading, selecting, adding, saving, rendering and the
+            *-genpols.py generators against that data, on the CSV backend
+            and a local SQLite database, and write the results as JSON
+"""
@@ -0,0 +1,172 @@
+#!/usr/bin/python
+#
+"""Generate synthetic bender tables for benchmarking
+
+Writes hostgroups.csv, service_templates.csv, policy.csv, an empty sdp.csv
+and addrdb.csv (an address book for every member, so renders need no DNS)
+in the same format as testdata/mock-*.csv.  Group sizes are skewed - a few
+large groups and many small ones; policies pick their groups evenly, so a
+render's size stays roughly in proportion to the number of policies.
+
+    python -m bench.gen_data [--members N] [--groups N] [--templates N]
+                             [--policies N] [--seed N] [--skew S] outdir
+"""
+
+import os
+import sys
+import csv as _csv
+import random
+import argparse
+
+VALID_FROM = '1970-01-01 00:00:01'
+VALID_TO = '2038-01-01 00:00:00'
+
+HG_FIELDS = ['hg_name', 'hg_member', 'hg_type', 'hg_owner', 'hg_rp',
+             'hg_valid_from', 'hg_valid_to', 'hg_wfid']
+ST_FIELDS = ['st_name', 'st_port', 'st_protocol', 'st_transport', 'st_bidir',
+             'st_owner', 'st_rp', 'st_valid_from', 'st_valid_to', 'st_wfid']
+P_FIELDS = ['p_name', 'p_source', 'p_destination', 'p_template', 'p_bidir',
+            'p_valid_from', 'p_valid_to', 'p_wfid']
+SDP_FIELDS = ['sdp_group', 'sdp_name', 'sdp_source', 'sdp_destination',
+              'sdp_source_ip', 'sdp_destination_ip', 'sdp_bidir', 'sdp_port',
+              'sdp_protocol', 'sdp_valid_from', 'sdp_valid_to', 'sdp_wfid']
+
+OWNERS = ['tom', 'jerri', 'walt', 'daffy', 'scrooge']
+
+def zipf_weights(count, skew):
+    """Relative weights 1/(i+1)^skew, for a skewed choice among count"""
+    return [1.0 / (i + 1) ** skew for i in range(count)]
+
+def weighted_choice(rnd, cumulative):
+    """Pick an index given the running totals of the weights"""
+    x = rnd.random() * cumulative[-1]
+    lo, hi = 0, len(cumulative) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if cumulative[mid] < x:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+def running_totals(weights):
+    """Return the cumulative sums of weights"""
+    totals = []
+    total = 0.0
+    for w in weights:
+        total += w
+        totals.append(total)
+    return totals
+
+def member_address(i):
+    """A unique 10.x.y.z address for member i"""
+    return '10.%d.%d.%d' % ((i >> 16) & 0xff, (i >> 8) & 0xff, i & 0xff)
+
+def gen_hostgroups(rnd, members, groups, skew):
+    """Assign every member to a group (group sizes zipf-skewed), plus a
+    second group for one member in ten; returns (rows, group names)"""
+    names = ['hg%05d' % g for g in range(groups)]
+    totals = running_totals(zipf_weights(groups, skew))
+    rows = []
+    for m in range(members):
+        member = 'host%06d' % m
+        picks = set([weighted_choice(rnd, totals)])
+        if rnd.random() < 0.1:
+            picks.add(rnd.randrange(groups))
+        for g in sorted(picks):
+            owner = rnd.choice(OWNERS)
+            rows.append({'hg_name': names[g], 'hg_member': member,
+                         'hg_type': rnd.choice(['internal', 'dmz', 'none']),
+                         'hg_owner': owner, 'hg_rp': owner,
+                         'hg_valid_from': VALID_FROM, 'hg_valid_to': VALID_TO,
+                         'hg_wfid': ''})
+    rows.sort(key=lambda r: r['hg_name'])
+    return (rows, names)
+
+def gen_templates(rnd, templates):
+    """Service templates with one to four port/protocol lines each"""
+    rows = []
+    names = ['svc%04d' % t for t in range(templates)]
+    for name in names:
+        for port in rnd.sample(range(1, 65536), rnd.randint(1, 4)):
+            owner = rnd.choice(OWNERS)
+            rows.append({'st_name': name, 'st_port': str(port),
+                         'st_protocol': rnd.choice(['tcp', 'tcp', 'udp']),
+                         'st_transport': name, 'st_bidir': 'TRUE',
+                         'st_owner': owner, 'st_rp': owner,
+                         'st_valid_from': VALID_FROM, 'st_valid_to': VALID_TO,
+                         'st_wfid': ''})
+    return (rows, names)
+
+def gen_policies(rnd, policies, group_names, template_names):
+    """Policies with one to three lines, between randomly chosen groups"""
+    rows = []
+    for p in range(policies):
+        for line in range(rnd.randint(1, 3)):
+            rows.append({'p_name': 'pol%05d' % p,
+                         'p_source': rnd.choice(group_names),
+                         'p_destination': rnd.choice(group_names),
+                         'p_template': rnd.choice(template_names),
+                         'p_bidir': 'TRUE',
+                         'p_valid_from': VALID_FROM, 'p_valid_to': VALID_TO,
+                         'p_wfid': ''})
+    return rows
+
+def write_csv(path, fields, rows):
+    """Write rows to path with a header line"""
+    with open(path, 'wb') as w_fd:
+        dictw = _csv.DictWriter(w_fd, fields, lineterminator='\n')
+        dictw.writeheader()
+        dictw.writerows(rows)
+
+def data_paths(outdir):
+    """The dictionary of table name -> path generate() writes in outdir"""
+    return dict((table, os.path.join(outdir, table + '.csv'))
+                for table in ('hostgroups', 'service_templates', 'policy',
+                              'sdp', 'addrdb'))
+
+def generate(outdir, members=2000, groups=200, templates=50, policies=300,
+             seed=1, skew=1.1):
+    """generate(outdir, members=2000, groups=200, templates=50, policies=300,
+                seed=1, skew=1.1)
+
+    Write the tables into outdir, returning a dictionary of table name ->
+    path, along with the row counts"""
+    rnd = random.Random(seed)
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    hg_rows, group_names = gen_hostgroups(rnd, members, groups, skew)
+    st_rows, template_names = gen_templates(rnd, templates)
+    p_rows = gen_policies(rnd, policies, group_names, template_names)
+    paths = data_paths(outdir)
+    write_csv(paths['hostgroups'], HG_FIELDS, hg_rows)
+    write_csv(paths['service_templates'], ST_FIELDS, st_rows)
+    write_csv(paths['policy'], P_FIELDS, p_rows)
+    write_csv(paths['sdp'], SDP_FIELDS, [])
+    write_csv(paths['addrdb'], ['name', 'address'],
+              [{'name': 'host%06d' % m, 'address': member_address(m)}
+               for m in range(members)])
+    counts = {'hostgroups': len(hg_rows), 'service_templates': len(st_rows),
+              'policy': len(p_rows), 'members': members}
+    return (paths, counts)
+
+def add_scale_arguments(parser):
+    """The data scale options, shared with run_bench"""
+    parser.add_argument('--members', type=int, default=2000)
+    parser.add_argument('--groups', type=int, default=200)
+    parser.add_argument('--templates', type=int, default=50)
+    parser.add_argument('--policies', type=int, default=300)
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help='zipf exponent for group sizes')
+    parser.add_argument('--seed', type=int, default=1)
+
+####################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='generate bender benchmark data')
+    add_scale_arguments(parser)
+    parser.add_argument('outdir')
+    args = parser.parse_args()
+    paths, counts = generate(args.outdir, args.members, args.groups,
+                             args.templates, args.policies, args.seed, args.skew)
+    for table in sorted(counts):
+        print >>sys.stderr, table, counts[table]
@@ -0,0 +1,271 @@
+#!/usr/bin/python
+#
+"""Time bender operations against generated data
+
+Generates a data set with bench.gen_data (or uses one given with --data),
+then times table loads, selects, adds, saves, a full render and the
+*-genpols.py generators, on the CSV backend and on a local SQLite copy of
+the same tables.  Results are written as JSON, so runs can be compared:
+
+    python -m bench.run_bench [scale options] [--output results.json]
+
+Each result is {"scenario", "backend", "seconds", "ops", "ops_per_sec"},
+or {"scenario", "backend", "skipped"} if it can't run.
+"""
+
+import os
+import sys
+import csv as _csv
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import sqlalchemy as _sa
+
+# run from the top of the tree, or from anywhere with it on the path
+TOP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if TOP not in sys.path:
+    sys.path.insert(0, TOP)
+
+import bender_obj
+import bender_render
+import bender_resolve
+from bench import gen_data
+
+SAMPLE_OPS = 200    # selects/adds per timed scenario
+AS_OF = '2000-01-01 00:00:00'   # as-of selects, inside the generated windows
+
+TABLES = [('hostgroups', 'host_group'), ('service_templates', 'service_template'),
+          ('policy', 'policy_group'), ('sdp', 'policy_render')]
+
+class bench_results(object):
+    """Collect timings and write them out as JSON"""
+
+    def __init__(self, meta):
+        self.meta = meta
+        self.results = []
+
+    def timed(self, scenario, backend, func, ops=1):
+        """Run func() once, recording the wall time; returns its result"""
+        start = time.time()
+        result = func()
+        seconds = time.time() - start
+        self.results.append({'scenario': scenario, 'backend': backend,
+                             'seconds': round(seconds, 6), 'ops': ops,
+                             'ops_per_sec': round(ops / seconds, 2) if seconds else None})
+        print >>sys.stderr, "%-28s %-7s %10.4fs  (%d ops)" % \
+            (scenario, backend, seconds, ops)
+        return result
+
+    def skipped(self, scenario, backend, reason):
+        """Record a scenario that couldn't run"""
+        self.results.append({'scenario': scenario, 'backend': backend,
+                             'skipped': reason})
+        print >>sys.stderr, "%-28s %-7s skipped: %s" % (scenario, backend, reason)
+
+    def write(self, w_fd):
+        json.dump({'meta': self.meta, 'results': self.results}, w_fd,
+                  indent=2, sort_keys=True)
+        w_fd.write('\n')
+
+def read_rows(path):
+    """Read a generated CSV table as a list of dictionaries"""
+    with open(path, 'rb') as r_fd:
+        return list(_csv.DictReader(r_fd))
+
+def sample_names(rnd, rows, key, count):
+    """count names (with repeats) from the key column of rows"""
+    names = sorted(set(r[key] for r in rows))
+    return [rnd.choice(names) for i in range(count)]
+
+def new_members(count):
+    """Host group rows for members not in the generated data"""
+    return [{'hg_name': 'hg%05d' % (i % 7), 'hg_member': 'newhost%06d' % i,
+             'hg_type': 'none', 'hg_owner': 'tom', 'hg_rp': 'tom',
+             'hg_valid_from': gen_data.VALID_FROM, 'hg_valid_to': gen_data.VALID_TO,
+             'hg_wfid': ''} for i in range(count)]
+
+def load_tables(module, uris):
+    """Open the four tables from module (bender_obj)"""
+    return [getattr(module, cls)(uris[table], table) for table, cls in TABLES]
+
+def copy_data(datadir, outdir):
+    """Copy the tables generated into datadir to outdir - the scenarios
+    add to and save them - returning (paths, counts) as generate() does"""
+    os.makedirs(outdir)
+    paths = gen_data.data_paths(outdir)
+    for table, path in gen_data.data_paths(datadir).items():
+        shutil.copyfile(path, paths[table])
+    counts = dict((table, len(read_rows(paths[table])))
+                  for table in ('hostgroups', 'service_templates', 'policy'))
+    counts['members'] = len(read_rows(paths['addrdb']))
+    return (paths, counts)
+
+def bench_csv(res, paths, rnd, workdir):
+    """CSV backend (bender_obj) scenarios"""
+    uris = dict((table, 'csv://' + paths[table]) for table, cls in TABLES)
+    for table, cls in TABLES:
+        res.timed('load_' + table, 'csv',
+                  lambda: getattr(bender_obj, cls)(uris[table], table))
+    hg, sg, pg, sdp = load_tables(bender_obj, uris)
+
+    hg_names = sample_names(rnd, hg.select(), 'hg_name', SAMPLE_OPS)
+    res.timed('select_hostgroup', 'csv',
+              lambda: [hg.select(hg_name=n) for n in hg_names], SAMPLE_OPS)
+    res.timed('select_hostgroup_as_of', 'csv',
+              lambda: [hg.select(hg_name=n, as_of=AS_OF) for n in hg_names], SAMPLE_OPS)
+    st_names = sample_names(rnd, sg.select(), 'st_name', SAMPLE_OPS)
+    res.timed('select_template', 'csv',
+              lambda: [sg.select(st_name=n, st_protocol='tcp') for n in st_names],
+              SAMPLE_OPS)
+
+    def add_each():
+        for row in new_members(SAMPLE_OPS):
+            hg.add(**row)
+    res.timed('add_hostgroup', 'csv', add_each, SAMPLE_OPS)
+    res.timed('add_many_hostgroup', 'csv',
+              lambda: hg.add_many(new_members(SAMPLE_OPS)), SAMPLE_OPS)
+
+    resolver = bender_resolve.address_book(paths['addrdb'])
+    changes = {}
+    res.timed('render', 'csv',
+              lambda: bender_render.render_sdp(hg, sg, pg, sdp, resolve=resolver,
+                                               changes=changes))
+    res.results[-1]['ops'] = len(changes['add'])
+
+    for table, obj in zip([t for t, c in TABLES], [hg, sg, pg, sdp]):
+        res.timed('save_' + table, 'csv', lambda: obj.save(paths[table]), obj.len())
+
+    sdp = bender_obj.policy_render(uris['sdp'], 'sdp')
+    if sdp.len():
+        groups = sample_names(rnd, sdp.select(), 'sdp_group', SAMPLE_OPS)
+        res.timed('select_sdp', 'csv',
+                  lambda: [sdp.select(sdp_group=g) for g in groups], SAMPLE_OPS)
+
+    # the generators take a single URI; only iptables-genpols.py (which
+    # reads just the SDP table) can run against a CSV file
+    policy = pg.select()[0]['p_name']
+    bench_genpols(res, 'csv', uris['sdp'], workdir, policy, ['iptables-genpols.py'])
+    for script in ['asa-genpols.py', 'ios-genpols.py']:
+        res.skipped(script, 'csv', 'needs every table behind one URI')
+
+def make_sqlite(paths, uri):
+    """Create a SQLite database holding the generated tables"""
+    engine = _sa.create_engine(uri)
+    for table, cls in TABLES:
+        # bender_obj creates the table, and its indexes
+        getattr(bender_obj, cls)(uri, table)
+        with open(paths[table], 'rb') as r_fd:
+            fields = _csv.reader(r_fd).next()
+        rows = read_rows(paths[table])
+        # lines added through the CSV backend have no validity window
+        for row in rows:
+            for field in fields:
+                if field.endswith('_valid_from') and not row[field]:
+                    row[field] = gen_data.VALID_FROM
+                elif field.endswith('_valid_to') and not row[field]:
+                    row[field] = gen_data.VALID_TO
+        if rows:
+            engine.execute(_sa.text('INSERT INTO %s VALUES (%s)' % \
+                                    (table, ', '.join(':' + f for f in fields))), rows)
+    engine.dispose()
+
+def bench_sqlite(res, paths, rnd, workdir):
+    """SQL backend scenarios, against a local SQLite database"""
+    uri = 'sqlite:///' + os.path.join(workdir, 'bender.db')
+    res.timed('create_db', 'sqlite', lambda: make_sqlite(paths, uri))
+    uris = dict((table, uri) for table, cls in TABLES)
+    for table, cls in TABLES:
+        res.timed('load_' + table, 'sqlite',
+                  lambda: getattr(bender_obj, cls)(uri, table))
+    hg, sg, pg, sdp = load_tables(bender_obj, uris)
+
+    hg_names = sample_names(rnd, hg.select(), 'hg_name', SAMPLE_OPS)
+    res.timed('select_hostgroup', 'sqlite',
+              lambda: [hg.select(hg_name=n) for n in hg_names], SAMPLE_OPS)
+    res.timed('select_hostgroup_as_of', 'sqlite',
+              lambda: [hg.select(hg_name=n, as_of=AS_OF) for n in hg_names], SAMPLE_OPS)
+    st_names = sample_names(rnd, sg.select(), 'st_name', SAMPLE_OPS)
+    res.timed('select_template', 'sqlite',
+              lambda: [sg.select(st_name=n, st_protocol='tcp') for n in st_names],
+              SAMPLE_OPS)
+    res.timed('len_hostgroup', 'sqlite', lambda: hg.len())
+
+    def add_each():
+        for row in new_members(SAMPLE_OPS):
+            for valid in ['hg_valid_from', 'hg_valid_to']:
+                del row[valid]
+            hg.add(**row)
+    res.timed('add_hostgroup', 'sqlite', add_each, SAMPLE_OPS)
+
+    resolver = bender_resolve.address_book(paths['addrdb'])
+    changes = {}
+    res.timed('render', 'sqlite',
+              lambda: bender_render.render_sdp(hg, sg, pg, sdp, resolve=resolver,
+                                               changes=changes))
+    res.results[-1]['ops'] = len(changes['add'])
+
+    groups = sample_names(rnd, sdp.select(), 'sdp_group', SAMPLE_OPS)
+    res.timed('select_sdp', 'sqlite',
+              lambda: [sdp.select(sdp_group=g) for g in groups], SAMPLE_OPS)
+
+    # every table is behind the one URI, so all of the generators run
+    policy = pg.select()[0]['p_name']
+    bench_genpols(res, 'sqlite', uri, workdir, policy,
+                  ['iptables-genpols.py', 'asa-genpols.py', 'ios-genpols.py'])
+
+def bench_genpols(res, backend, uri, workdir, policy, scripts):
+    """Time each generator script for policy, with a bender.cf naming uri"""
+    rundir = os.path.join(workdir, 'genpols-' + backend)
+    if not os.path.isdir(rundir):
+        os.makedirs(rundir)
+    with open(os.path.join(rundir, 'bender.cf'), 'wb') as w_fd:
+        w_fd.write('[database]\nURI=%s\n' % (uri))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = TOP + os.pathsep + env.get('PYTHONPATH', '')
+    for script in scripts:
+        with open(os.devnull, 'wb') as devnull:
+            rc = res.timed(script, backend, lambda: subprocess.call(
+                [sys.executable, os.path.join(TOP, script), policy],
+                cwd=rundir, env=env, stdout=devnull))
+        res.results[-1]['returncode'] = rc
+
+####################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='time bender operations')
+    gen_data.add_scale_arguments(parser)
+    parser.add_argument('--data', help='use (copies of) the tables already generated here')
+    parser.add_argument('--output', help='write the JSON results here (default stdout)')
+    parser.add_argument('--backend', action='append', choices=['csv', 'sqlite'],
+                        help='run only these backends')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bender-bench-')
+    try:
+        datadir = os.path.join(workdir, 'data')
+        if args.data:
+            paths, counts = copy_data(args.data, datadir)
+        else:
+            paths, counts = gen_data.generate(datadir, args.members, args.groups,
+                                              args.templates, args.policies,
+                                              args.seed, args.skew)
+        res = bench_results({'scale': vars(args), 'rows': counts,
+                             'python': platform.python_version(),
+                             'sqlalchemy': _sa.__version__,
+                             'started': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())})
+        for backend, bench in [('csv', bench_csv), ('sqlite', bench_sqlite)]:
+            if args.backend and backend not in args.backend:
+                continue
+            bench(res, paths, random.Random(args.seed), workdir)
+        if args.output:
+            with open(args.output, 'wb') as w_fd:
+                res.write(w_fd)
+        else:
+            res.write(sys.stdout)
+    finally:
+        shutil.rmtree(workdir)
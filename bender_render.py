@@ -0,0 +1,395 @@
+#!/usr/bin/python
+#
+"""Render policy statements into source/destination/protocol (SDP) tuples
+
+A policy says "Source Group accesses Destination Group for Template".
+Rendering expands that into one SDP row for every source member,
+destination member and service line in the template.
+
+Rather than asking the host group and service template objects for each
+group name as the policies are walked (a full scan for CSV, a round trip
+for SQL), the tables are read once and hashed by name.  The members of the
+policies being rendered are then resolved together (see bender_resolve),
+and the expansion only touches the rows it emits.  Large renders can be
+split by policy name across a pool of processes (render_sdp(processes=)).
+
+render_sdp() stores the rows in a policy_render table; iter_sdp() yields
+them one at a time instead, for generators that don't need the table.
+"""
+
+import sys
+import heapq
+import multiprocessing
+
+from bender_resolve import gethostaddr, resolve_hosts, resolver_from_config, \
+    DEFAULT_WORKERS, DEFAULT_TIMEOUT, TIMED_OUT
+
+def hash_rows(rows, key):
+    """hash_rows(rows, key)
+
+    Build a dictionary of key value -> list of rows.  As with select() on
+    a CSV table, a row with an empty key field matches every name; those
+    rows are merged into each list in table order, and are also what an
+    unknown name maps to (under '')."""
+    named = {}
+    wild = []
+    for pos, row in enumerate(rows):
+        if row[key]:
+            named.setdefault(row[key], []).append((pos, row))
+        else:
+            wild.append((pos, row))
+    hmap = {}
+    for name in named:
+        hmap[name] = [r for p, r in heapq.merge(named[name], wild)]
+    hmap[''] = [r for p, r in wild]
+    return hmap
+
+def lookup(hmap, name):
+    """Return the rows hashed under name by hash_rows()"""
+    return hmap.get(name, hmap[''])
+
+def expand_policy(policy, hosts, services, addrs):
+    """expand_policy(policy, hosts, services, addrs)
+
+    Return the list of SDP rows (dictionaries) for a single policy line.
+    hosts and services are the hash_rows() maps of host groups and service
+    templates, and addrs maps member names to addresses; pairs with a
+    member missing from addrs (it didn't resolve) are skipped."""
+    return list(iter_expand(policy, hosts, services, addrs))
+
+def iter_expand(policy, hosts, services, addrs):
+    """Generate the SDP rows of expand_policy() one at a time"""
+    dsts = lookup(hosts, policy['p_destination'])
+    svcs = lookup(services, policy['p_template'])
+    for src in lookup(hosts, policy['p_source']):
+        if src['hg_member'] not in addrs:
+            continue
+        source_ip = addrs[src['hg_member']]
+        for dst in dsts:
+            if dst['hg_member'] not in addrs:
+                continue
+            if src['hg_member'] == dst['hg_member']:
+                continue
+            destination_ip = addrs[dst['hg_member']]
+            for svc in svcs:
+                yield {
+                    'sdp_group': policy['p_name'],
+                    'sdp_name': "%s_%s_%s" % (src['hg_name'], dst['hg_name'],
+                                              svc['st_name']),
+                    'sdp_source': src['hg_member'],
+                    'sdp_source_ip': source_ip,
+                    'sdp_destination': dst['hg_member'],
+                    'sdp_destination_ip': destination_ip,
+                    'sdp_bidir': svc['st_bidir'],
+                    'sdp_port': svc['st_port'],
+                    'sdp_protocol': svc['st_protocol']}
+
+def iter_sdp(hg, sg, pg, resolve=gethostaddr, groups=None, errors=None,
+             workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT):
+    """iter_sdp(hg, sg, pg, resolve=gethostaddr, groups=None, errors=None,
+                workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT)
+
+    Generate the SDP rows for the policies in pg (only those named in
+    groups, if given) as they are expanded, in the order render_sdp()
+    would add them - as there, a row with the SDP_KEY of an earlier one is
+    skipped.  Only the host, service and address maps, and the keys of
+    the policy being expanded, are held in memory, not the rendered rows.  Lookup failures are
+    appended to the errors list, if one is passed."""
+    policies = pg.select()
+    if groups is not None:
+        policies = [p for p in policies if p['p_name'] in groups]
+    if not policies:
+        return
+    hosts = hash_rows(hg.select(), 'hg_name')
+    services = hash_rows(sg.select(), 'st_name')
+    addrs, failed = resolve_hosts(policy_members(policies, hosts), resolve,
+                                  workers, timeout)
+    if errors is not None:
+        errors.extend(lookup_errors(failed))
+    # SDP_KEY starts with sdp_group (p_name), so only rows of the same
+    # policy can repeat - keep each policy's keys until its last line
+    last = dict((policy['p_name'], pos) for pos, policy in enumerate(policies))
+    seen = {}
+    for pos, policy in enumerate(policies):
+        keys = seen.setdefault(policy['p_name'], set())
+        for row in iter_expand(policy, hosts, services, addrs):
+            key = sdp_key(row)
+            if key not in keys:
+                keys.add(key)
+                yield row
+        if last[policy['p_name']] == pos:
+            del seen[policy['p_name']]
+
+def lookup_errors(failed):
+    """Format the resolve_hosts() failures as error messages"""
+    return ["Error looking up %s: %s" % (name, failed[name])
+            for name in sorted(failed)]
+
+def policy_members(policies, hosts):
+    """Return the set of member names used by the policies"""
+    names = set()
+    for policy in policies:
+        for group in (policy['p_source'], policy['p_destination']):
+            for h in lookup(hosts, group):
+                names.add(h['hg_member'])
+    return names
+
+# the read-only host, service and address maps, in each render process
+_shared_maps = None
+
+def _init_worker(hosts, services, addrs):
+    """Pool initializer - keep the maps for _expand_partition()"""
+    global _shared_maps
+    _shared_maps = (hosts, services, addrs)
+
+def _expand_partition(partition):
+    """Expand a list of (position, policy) in a pool process, returning
+    a list of (position, SDP rows)"""
+    hosts, services, addrs = _shared_maps
+    return [(pos, expand_policy(policy, hosts, services, addrs))
+            for pos, policy in partition]
+
+def partition_policies(policies, hosts, services, count):
+    """partition_policies(policies, hosts, services, count)
+
+    Split the policies into at most count lists of (position, policy),
+    keeping lines with the same p_name together, and balancing the lists
+    by the number of rows each policy line would expand to."""
+    by_name = {}
+    for pos, policy in enumerate(policies):
+        by_name.setdefault(policy['p_name'], []).append((pos, policy))
+    def cost(lines):
+        return sum(len(lookup(hosts, p['p_source'])) *
+                   len(lookup(hosts, p['p_destination'])) *
+                   len(lookup(services, p['p_template'])) for pos, p in lines)
+    # largest groups first, each to the least loaded partition
+    bins = [(0, i, []) for i in range(min(count, len(by_name)))]
+    for lines in sorted(by_name.values(), key=cost, reverse=True):
+        load, i, partition = heapq.heappop(bins)
+        partition.extend(lines)
+        heapq.heappush(bins, (load + cost(lines), i, partition))
+    return [partition for load, i, partition in sorted(bins, key=lambda b: b[1])]
+
+def expand_parallel(policies, hosts, services, addrs, processes):
+    """expand_parallel(policies, hosts, services, addrs, processes)
+
+    Expand the policies across a pool of processes, returning the SDP rows
+    in the same order as expanding them one at a time would."""
+    pool = multiprocessing.Pool(processes, _init_worker, (hosts, services, addrs))
+    try:
+        results = pool.map(_expand_partition,
+                           partition_policies(policies, hosts, services, processes))
+    finally:
+        pool.close()
+        pool.join()
+    by_pos = [None] * len(policies)
+    for partition in results:
+        for pos, rows in partition:
+            by_pos[pos] = rows
+    return [row for rows in by_pos for row in rows]
+
+class render_deps(object):
+    """render_deps()
+
+    Dependency index from host group and service template names to the
+    policies (SDP groups) that use them, along with the set of policies
+    that need re-rendering.  Edits to host groups, service templates and
+    policies mark the affected policies dirty with the touch_*() methods;
+    render_sdp(..., deps=) then rebuilds only those SDP groups.  Until the
+    first render, everything is dirty."""
+
+    def __init__(self):
+        self._by_group = {}     # host group name -> set of policy names
+        self._by_template = {}  # service template name -> set of policy names
+        self._dirty = set()     # policy (sdp_group) names to re-render
+        self._full = True       # re-render everything
+
+    def rebuild(self, policies):
+        """Re-index the policies; usually done at render time"""
+        self._by_group = {}
+        self._by_template = {}
+        for policy in policies:
+            for name in (policy['p_source'], policy['p_destination']):
+                self._by_group.setdefault(name, set()).add(policy['p_name'])
+            self._by_template.setdefault(policy['p_template'], set()).add(policy['p_name'])
+
+    def touch_hostgroup(self, name):
+        """Mark the policies using host group name as a source or destination"""
+        if not name:
+            self._full = True   # an unnamed group row matches every group
+        self._dirty.update(self._by_group.get(name, ()))
+
+    def touch_template(self, name):
+        """Mark the policies using the service template name"""
+        if not name:
+            self._full = True
+        self._dirty.update(self._by_template.get(name, ()))
+
+    def touch_policy(self, name):
+        """Mark the policy name - added, deleted or changed lines"""
+        if not name:
+            self._full = True
+        self._dirty.add(name)
+
+    def touch_all(self):
+        """Mark everything for re-rendering"""
+        self._full = True
+
+    def dirty(self):
+        """Return the set of policy names to re-render, or None for all"""
+        if self._full:
+            return None
+        return set(self._dirty)
+
+    def clear(self, names=None):
+        """The policies names (a set from dirty()) have been rendered - or
+        everything, if names is None; touches since then are kept"""
+        if names is None:
+            self._dirty = set()
+            self._full = False
+        else:
+            self._dirty -= names
+
+# what makes an SDP row distinct, for comparing renderings
+SDP_KEY = ('sdp_group', 'sdp_source_ip', 'sdp_destination_ip', 'sdp_port',
+           'sdp_protocol', 'sdp_bidir')
+
+def sdp_key(row):
+    """Return the SDP_KEY tuple for row; values are compared as strings,
+    so CSV and SQL rows (e.g. port '53' and 53) compare the same"""
+    return tuple(str(row[field]) for field in SDP_KEY)
+
+def sdp_delta(current, rendered):
+    """sdp_delta(current, rendered)
+
+    Compare the current SDP rows against a new rendering by SDP_KEY, and
+    return a change set dictionary: 'add' - the rendered rows not already
+    present, and 'remove' - the current rows no longer rendered (along with
+    any duplicates of a current row).  Rows keep their original order."""
+    old = set()
+    dups = set()     # id() of the repeats of a current row
+    for row in current:
+        key = sdp_key(row)
+        if key in old:
+            dups.add(id(row))
+        old.add(key)
+    new = set()
+    adds = []
+    for row in rendered:
+        key = sdp_key(row)
+        if key in new:
+            continue
+        new.add(key)
+        if key not in old:
+            adds.append(row)
+    removes = [row for row in current
+               if id(row) in dups or sdp_key(row) not in new]
+    return {'add': adds, 'remove': removes}
+
+def write_delta(sdp, delta):
+    """Apply an sdp_delta() change set to sdp - in bulk, if the table has
+    delete_many()/add_many() methods (bender_obj's tables, and
+    bender_sql's policy_render)"""
+    if hasattr(sdp, 'add_many'):
+        sdp.delete_many(delta['remove'])
+        sdp.add_many(delta['add'])
+        return
+    for row in delta['remove']:
+        sdp.delete(row)
+    for row in delta['add']:
+        sdp.add(**row)
+
+def render_sdp(hg, sg, pg, sdp, resolve=gethostaddr, deps=None,
+               workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, processes=1,
+               changes=None):
+    """render_sdp(hg, sg, pg, sdp, resolve=gethostaddr, deps=None,
+                  workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, processes=1,
+                  changes=None)
+
+    Expand every policy in pg against the host groups in hg and the
+    service templates in sg, and bring sdp up to date with the result:
+    rather than clearing and re-adding the table, only rows that are new
+    are added, and only rows that are no longer rendered are deleted (see
+    sdp_delta).  Each table is read once, and the distinct members of the
+    policies are resolved up front with resolve_hosts(resolve, workers,
+    timeout).  Returns a list of error messages, one per member that could
+    not be resolved; the current rows of a member whose lookup timed out
+    are kept, rather than removed.  If changes is a dictionary, the change set applied
+    is stored in it as 'add' and 'remove' lists of rows.
+
+    With a render_deps object, only the SDP groups of the dirty policies
+    are rendered (all of them, if everything is dirty); deps is
+    re-indexed, and cleared of them once sdp has been written.
+
+    With processes > 1, the policies are expanded by a pool of that many
+    processes, split by policy name; the rows are added in the same order
+    as a serial render."""
+    policies = pg.select()
+    groups = None
+    if deps is not None:
+        groups = deps.dirty()
+        deps.rebuild(policies)
+    if groups is None:
+        current = list(sdp.select())
+    else:
+        policies = [p for p in policies if p['p_name'] in groups]
+        current = [row for group in sorted(groups)
+                   for row in sdp.select(sdp_group=group)]
+    errors = []
+    sdp_rows = []
+    unsettled = set()   # members whose lookups didn't finish
+    if policies:
+        hosts = hash_rows(hg.select(), 'hg_name')
+        services = hash_rows(sg.select(), 'st_name')
+        addrs, failed = resolve_hosts(policy_members(policies, hosts), resolve,
+                                      workers, timeout)
+        errors = lookup_errors(failed)
+        unsettled = set(name for name in failed if failed[name] == TIMED_OUT)
+        if processes > 1:
+            sdp_rows = expand_parallel(policies, hosts, services, addrs, processes)
+        else:
+            sdp_rows = (row for policy in policies
+                        for row in iter_expand(policy, hosts, services, addrs))
+    delta = sdp_delta(current, sdp_rows)
+    if unsettled:
+        # a slow lookup is not a host gone - keep the rows rendered for it
+        delta['remove'] = [row for row in delta['remove']
+                           if row['sdp_source'] not in unsettled and
+                           row['sdp_destination'] not in unsettled]
+    write_delta(sdp, delta)
+    if deps is not None:
+        # only now - if the write failed, the next render tries again
+        deps.clear(groups)
+    if changes is not None:
+        changes.update(delta)
+    return errors
+
+####################
+if __name__ == '__main__':
+    import bender_obj as bender
+
+    # optional argument - the number of render processes
+    processes = 1
+    if len(sys.argv) > 1:
+        processes = int(sys.argv[1])
+
+    pol_db_cfg = bender.read_config("database", ['/etc/bender.cf', 'bender.cf'])
+
+    h_groups = bender.host_group(pol_db_cfg['uri'], 'hostgroups')
+    s_groups = bender.service_template(pol_db_cfg['uri'], 'service_templates')
+    p_groups = bender.policy_group(pol_db_cfg['uri'], 'policy')
+    sdp_groups = bender.policy_render(pol_db_cfg['uri'], 'sdp')
+
+    resolver = resolver_from_config(['/etc/bender.cf', 'bender.cf'])
+
+    render_changes = {}
+    render_errors = render_sdp(h_groups, s_groups, p_groups, sdp_groups,
+                               resolve=resolver, processes=processes,
+                               changes=render_changes)
+    for e_msg in render_errors:
+        print >>sys.stderr, e_msg
+    print "Added", len(render_changes['add']), "and removed", \
+        len(render_changes['remove']), "SDP lines"
+    resolver.save()
+    sdp_groups.save(pol_db_cfg['uri'].split('://')[1])
+    print "Rendered", sdp_groups.len(), "SDP lines"
@@ -0,0 +1,309 @@
+#!/usr/bin/python
+#
+"""Resolve host group members to addresses for policy rendering
+
+gethostaddr() looks up a single name.  resolve_hosts() looks up a set of
+names at once, in parallel with a bounded pool of threads, so that a render
+resolves each distinct member once and one slow lookup doesn't hold up
+the others.  resolver_cache sits in front of either, remembering answers
+(and failures) across renders and, optionally, across processes.
+address_book answers from a local hosts file or CSV inventory, falling back
+to DNS only if asked to, so a render can run without any network lookups.
+"""
+
+import os
+import csv as _csv
+import json
+import time
+import socket
+import threading
+import collections
+import ConfigParser
+import multiprocessing.pool
+
+from bender_obj import _replace_file
+
+DEFAULT_WORKERS = 16    # concurrent lookups
+DEFAULT_TIMEOUT = 5.0   # seconds to wait on any one lookup
+TIMED_OUT = 'lookup timed out'  # resolve_hosts() error for an unfinished lookup
+
+# gethostaddr - similar to socket.gethostbyname() - but use getaddrinfo() to deal
+# with IPv6 addresses
+def gethostaddr(name):
+    """gethostaddr(name)
+
+    Return the first address for name; IP addresses and networks are
+    returned as-is.  Raises socket.gaierror for names that don't resolve."""
+    if is_address(name):
+        return name
+    h_infos = socket.getaddrinfo(name, None, 0, 0, socket.SOL_TCP)
+    # go for the first item returned in the array
+    return h_infos[0][4][0]
+
+def is_address(name):
+    """True if name looks like an IPv4 or IPv6 address or network"""
+    # a _very_ bad way to if name is an IP address or IP network (v4 or v6)
+    return name.strip('0123456789/.:abcdefABCDEF') == ''
+
+def _lookup_err(resolve, name, running):
+    """Run resolve(name) in a worker, handing back (address, error message);
+    running maps name to the time the lookup began, while it runs"""
+    running[name] = time.time()
+    try:
+        return (resolve(name), None)
+    except Exception as err:
+        # anything raised here would otherwise surface from result.get()
+        return (None, str(err))
+    finally:
+        del running[name]
+
+def resolve_hosts(names, resolve=gethostaddr, workers=DEFAULT_WORKERS,
+                  timeout=DEFAULT_TIMEOUT):
+    """resolve_hosts(names, resolve=gethostaddr, workers=DEFAULT_WORKERS,
+                     timeout=DEFAULT_TIMEOUT)
+
+    Resolve each distinct name in names with resolve(), using up to workers
+    threads and waiting at most timeout seconds on each lookup, from when
+    a worker starts it.  Returns a tuple of dictionaries (addrs, errors):
+    name->address for the names that resolved, and name->error message for
+    those that didn't - TIMED_OUT for a lookup that ran too long, or that
+    never started as every worker was held by one that did."""
+    addrs = {}
+    errors = {}
+    names = set(names)
+    if not names:
+        return (addrs, errors)
+    size = min(workers, len(names))
+    pool = multiprocessing.pool.ThreadPool(size)
+    running = {}
+    try:
+        pending = [(name, pool.apply_async(_lookup_err, (resolve, name, running)))
+                   for name in names]
+        for name, result in pending:
+            while not result.ready():
+                now = time.time()
+                start = running.get(name)
+                if start is not None:
+                    if now - start >= timeout:
+                        break
+                    result.wait(start + timeout - now)
+                    continue
+                # still queued - wait for a worker to come free
+                ends = [s + timeout for s in running.values()]
+                live = [end for end in ends if end > now]
+                if not live and len(ends) >= size:
+                    break
+                result.wait(min(live) - now if live else 0.01)
+            if result.ready():
+                addr, e_msg = result.get()
+            else:
+                addr, e_msg = (None, TIMED_OUT)
+            if e_msg is None:
+                addrs[name] = addr
+            else:
+                errors[name] = e_msg
+    finally:
+        # a lookup stuck in getaddrinfo() can't be interrupted; leave it behind
+        pool.terminate()
+    return (addrs, errors)
+
+class resolver_cache(object):
+    """resolver_cache(resolve=gethostaddr, ttl=3600, negative_ttl=60,
+                      max_entries=65536, path=None)
+
+    A caching front end to resolve(name), itself callable the same way.
+    Addresses are kept for ttl seconds; names that fail with
+    socket.gaierror are remembered for negative_ttl seconds and fail again
+    without a lookup.  At most max_entries names are kept, dropping the
+    least recently used.  If path is given, the cache is loaded from it
+    and save() writes it back, so the next process starts warm."""
+
+    def __init__(self, resolve=gethostaddr, ttl=3600, negative_ttl=60,
+                 max_entries=65536, path=None):
+        self._resolve = resolve
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._max_entries = max_entries
+        self._path = path
+        # name -> (expires, address, gaierror args) in LRU order
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()   # resolve_hosts() calls from threads
+        self.hits = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __call__(self, name):
+        """Return the address for name, from the cache if still valid"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry is not None and entry[0] > now:
+                self._entries[name] = entry   # most recently used
+                self.hits += 1
+            else:
+                entry = None
+                self.misses += 1
+        if entry is None:
+            try:
+                entry = (now + self._ttl, self._resolve(name), None)
+            except socket.gaierror as err:
+                entry = (now + self._negative_ttl, None, err.args)
+            self._store(name, entry)
+        if entry[2] is not None:
+            raise socket.gaierror(*entry[2])
+        return entry[1]
+
+    def _store(self, name, entry):
+        """Cache entry for name, evicting the least recently used names"""
+        with self._lock:
+            self._entries.pop(name, None)
+            self._entries[name] = entry
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Return a dictionary of hits, misses and entries"""
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': len(self._entries)}
+
+    def clear(self):
+        """Forget all cached names"""
+        with self._lock:
+            self._entries.clear()
+
+    def load(self, path=None):
+        """Merge unexpired entries from the snapshot at path"""
+        path = path or self._path
+        now = time.time()
+        with open(path, 'rb') as r_fd:
+            snapshot = json.load(r_fd)
+        for name, expires, addr, error in snapshot:
+            if expires > now:
+                # json hands back unicode; addresses and names are plain ASCII
+                self._store(str(name), (expires, addr and str(addr),
+                                        error and tuple(error)))
+
+    def save(self, path=None):
+        """Write unexpired entries to path (default, the one loaded from),
+        least recently used first.  Without a path, this does nothing."""
+        path = path or self._path
+        if path is None:
+            return False
+        now = time.time()
+        with self._lock:
+            snapshot = [[name, e[0], e[1], e[2]]
+                        for name, e in self._entries.iteritems() if e[0] > now]
+        # a synced copy renamed over path, as bender_obj saves tables - a
+        # reader (or a crash) never sees half a file
+        _replace_file(path, lambda w_fd: json.dump(snapshot, w_fd))
+        return True
+
+class address_book(object):
+    """address_book(path=None, fallback=None)
+
+    A resolver (callable as resolve(name)) answering from a local table of
+    name -> addresses.  The table is either a hosts file ("address name
+    [alias ...]" lines) or, for files ending in .csv, a CSV file with
+    "name" and "address" columns; a name may be listed more than once.
+    Names not in the table go to fallback(name) (e.g. gethostaddr, or a
+    resolver_cache) or, without a fallback, fail with socket.gaierror."""
+
+    def __init__(self, path=None, fallback=None):
+        self._addrs = {}     # name -> list of addresses, in file order
+        self._fallback = fallback
+        self.hits = 0
+        if path is not None:
+            self.load(path)
+
+    def load(self, path):
+        """Add the names and addresses in the hosts or CSV file path"""
+        with open(path, 'rb') as r_fd:
+            if path.endswith('.csv'):
+                for row in _csv.DictReader(r_fd):
+                    self.add(row['name'].strip(), row['address'].strip())
+                return
+            for line in r_fd:
+                fields = line.split('#')[0].split()
+                for name in fields[1:]:
+                    self.add(name, fields[0])
+
+    def add(self, name, address):
+        """Add address to the list for name"""
+        addrs = self._addrs.setdefault(name, [])
+        if address not in addrs:
+            addrs.append(address)
+
+    def addresses(self, name):
+        """Return all of the addresses listed for name"""
+        return list(self._addrs.get(name, []))
+
+    def __call__(self, name):
+        """Return the first address for name"""
+        if is_address(name):
+            return name
+        if name in self._addrs:
+            self.hits += 1
+            return self._addrs[name][0]
+        if self._fallback is None:
+            raise socket.gaierror(socket.EAI_NONAME, 'Name not in address book')
+        return self._fallback(name)
+
+    def stats(self):
+        """Return a dictionary of address book hits and entries, along with
+        the fallback's statistics if it keeps any"""
+        stats = {'book_hits': self.hits, 'book_entries': len(self._addrs)}
+        if hasattr(self._fallback, 'stats'):
+            stats.update(self._fallback.stats())
+        return stats
+
+    def save(self, path=None):
+        """Save the fallback resolver's cache, if it has one"""
+        if hasattr(self._fallback, 'save'):
+            return self._fallback.save(path)
+        return False
+
+def read_resolver_config(file_list):
+    """read_resolver_config(file_list)
+
+    Return resolver_cache() keyword arguments from the optional [resolver]
+    section of the bender configuration files:
+        [resolver]
+        cache=/var/tmp/bender-resolver.json
+        ttl=3600
+        negative_ttl=60
+        max_entries=65536
+    The address book options (addressbook=, dns=) are left to
+    resolver_from_config()."""
+    config = ConfigParser.ConfigParser()
+    config.read(file_list)
+    kwargs = {}
+    if not config.has_section('resolver'):
+        return kwargs
+    if config.has_option('resolver', 'cache'):
+        kwargs['path'] = config.get('resolver', 'cache')
+    for option in ['ttl', 'negative_ttl', 'max_entries']:
+        if config.has_option('resolver', option):
+            kwargs[option] = config.getint('resolver', option)
+    return kwargs
+
+def resolver_from_config(file_list):
+    """resolver_from_config(file_list)
+
+    Build the resolver described by the [resolver] section of the bender
+    configuration files: a resolver_cache in front of gethostaddr(), and
+    in front of that an address book if one is configured:
+        [resolver]
+        addressbook=testdata/mock-addrdb.csv
+        dns=no
+    With dns=no, names missing from the address book fail rather than
+    being looked up."""
+    config = ConfigParser.ConfigParser()
+    config.read(file_list)
+    resolver = resolver_cache(**read_resolver_config(file_list))
+    if not config.has_option('resolver', 'addressbook'):
+        return resolver
+    if config.has_option('resolver', 'dns') and \
+       not config.getboolean('resolver', 'dns'):
+        resolver = None
+    return address_book(config.get('resolver', 'addressbook'), fallback=resolver)
@@ -13,6 +13,8 @@ import sys
 import sqlalchemy as _sa
 import time
 import ConfigParser
+from bender_obj import sql_engine, pool_from_config, stream_rows, SELECT_FETCH, \
+    sql_bind, transaction
 
 def read_config(section, file_list):
     """read_config(section, file_list)
@@ -30,6 +32,26 @@ def read_config(section, file_list):
             dict1[option] = None
     return dict1
 
+def _compiled(obj, key, build):
+    """_compiled(obj, key, build)
+
+    Return the statement from build(), compiled for obj's engine once for
+    each key (the operation, and the fields it takes) and kept in
+    obj._stmts, so repeated calls only bind new parameters"""
+    stmt = obj._stmts.get(key)
+    if stmt is None:
+        stmt = obj._stmts[key] = build().compile(bind=obj.engine)
+    return stmt
+
+def _params(kwargs, **params):
+    """_params(kwargs, **params)
+
+    The bound parameters of a where clause on the fields of kwargs - see
+    the __kwarg2sel() methods - along with params"""
+    for k in kwargs:
+        params['w_' + k] = kwargs[k]
+    return params
+
 class host_group:
     """host_group(table_name)
 
@@ -53,12 +75,12 @@ class host_group:
 
         # Open, reflect on the database to determine fields
         try:
-            self.meta_data = _sa.MetaData()
-            self.engine = _sa.create_engine(engine_uri)
-            self.connection = self.engine.connect()
+            # one engine, and pool of connections, for all of the tables
+            self.engine, self.meta_data = sql_engine(engine_uri)
             self.hostgroups = _sa.Table(table_name, self.meta_data,
                                                        autoload=True, autoload_with=self.engine)
             self.table_name = table_name
+            self._stmts = {}   # compiled statements - see _compiled()
         except:
             raise
 
@@ -72,28 +94,23 @@ class host_group:
                 sys.exit(1)
 
     def __valid_utc(self):
-        return "%s.hg_valid_from<=utc_timestamp() and %s.hg_valid_to > utc_timestamp()" % \
-            (self.table_name, self.table_name)
-
-    def __kwarg2sel(self, **kwargs):
-        """Given a set of kwargs, convert to a select statement"""
-        a = ''
-        andp = ''
-        for k in kwargs:
-            a = a + andp + "%s.%s = \'%s\'" % (self.table_name, k, kwargs[k])
-            andp = " and "
-        return a
+        return _sa.text("%s.hg_valid_from<=utc_timestamp() and %s.hg_valid_to > utc_timestamp()" % \
+                        (self.table_name, self.table_name))
+
+    def __kwarg2sel(self, fields):
+        """Given a set of fields, form the where clause matching each to
+        the bound parameter "w_<field>" - see _params()"""
+        return _sa.and_(*[self.hostgroups.c[f] == _sa.bindparam('w_' + f) for f in fields])
 
     def len(self):
         """Return the number of overall members stored"""
-        now_t = "%s.hg_valid_from <= utc_timestamp() and %s.hg_valid_to > utc_timestamp()" % \
-                (self.table_name, self.table_name)
         try:
-            i = self.hostgroups.count().where(now_t)
+            i = _compiled(self, ('len',), lambda: _sa.select([_sa.func.count()]).\
+                          select_from(self.hostgroups).where(self.__valid_utc()))
         except _sa.exc.SQLAlchemyError as e:
             print e
             raise
-        c = self.connection.execute(i)
+        c = sql_bind(self.engine).execute(i)
         return c.scalar()
 
     def save(self, table_name):
@@ -103,10 +120,13 @@ class host_group:
 
     def update(self, k_selection, k_update):
         """Update rows matched in k_selection with fields k_update"""
-        a = self.__kwarg2sel(**k_selection)
-        a = a + " and " + self.__valid_utc()
-        i = self.hostgroups.update().where(a).values(k_update)
-        return self.connection.execute(i)
+        fields = tuple(sorted(k_selection))
+        values = tuple(sorted(k_update))
+        i = _compiled(self, ('update', fields, values), lambda: self.hostgroups.update().\
+                      where(_sa.and_(self.__kwarg2sel(fields), self.__valid_utc())).\
+                      values(dict((f, _sa.bindparam('v_' + f)) for f in values)))
+        return sql_bind(self.engine).execute(i, _params(
+            k_selection, **dict(('v_' + f, k_update[f]) for f in values)))
 
     def add(self, **kwargs):
         """Add a new member to the database, with the field values"""
@@ -117,26 +137,24 @@ class host_group:
         kwargs['hg_valid_from'] = start_t
         kwargs['hg_valid_to'] = '2038-01-01 00:00:00'  # close to maximum TIMESTAMP value
         i = self.hostgroups.insert(values=kwargs)
-        return self.connection.execute(i)
+        return sql_bind(self.engine).execute(i)
 
     def delete(self, d):
         """Delete the member from the database"""
         end_t = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
-        a = self.__kwarg2sel(**d)
-        i = self.hostgroups.update().where(a).values(hg_valid_to=end_t)
-        return self.connection.execute(i)
+        fields = tuple(sorted(d))
+        i = _compiled(self, ('delete', fields), lambda: self.hostgroups.update().\
+                      where(self.__kwarg2sel(fields)).\
+                      values(hg_valid_to=_sa.bindparam('end_t')))
+        return sql_bind(self.engine).execute(i, _params(d, end_t=end_t))
 
     def select(self, **kwargs):
         """Select a subset of members, selected by the field/value criteria"""
-        a = self.__kwarg2sel(**kwargs)
-        andp = ''
-        if len(a):
-            andp = " and "
-        # limit selects to current records
-        a = a + andp + self.__valid_utc()
+        fields = tuple(sorted(kwargs))
         try:
-            s = self.hostgroups.select().where(a)
-            rows = self.connection.execute(s)
+            # limit selects to current records
+            s = self.__select_stmt(fields)
+            rows = sql_bind(self.engine).execute(s, _params(kwargs))
         except _sa.exc.SQLAlchemyError as e:
             print e
             raise e
@@ -146,6 +164,17 @@ class host_group:
         self._host_groups = r
         return r
 
+    def __select_stmt(self, fields):
+        """The select of the current rows matching fields"""
+        return _compiled(self, ('select', fields), lambda: self.hostgroups.select().\
+                         where(_sa.and_(self.__kwarg2sel(fields), self.__valid_utc())))
+
+    def iter_select(self, fetch_size=SELECT_FETCH, **kwargs):
+        """Yield the rows select(**kwargs) would return, as they arrive,
+        fetch_size at a time - see bender_obj.stream_rows()"""
+        return stream_rows(sql_bind(self.engine), self.__select_stmt(tuple(sorted(kwargs))),
+                           _params(kwargs), fetch_size)
+
     def __iter__(self):
         """Return an iterator structure for moving through the list
         of members"""
@@ -175,12 +204,12 @@ class service_template:
 
         # Open, Peek into the CSV, and create DictReader
         try:
-            self.meta_data = _sa.MetaData()
-            self.engine = _sa.create_engine(engine_uri)
-            self.connection = self.engine.connect()
+            # one engine, and pool of connections, for all of the tables
+            self.engine, self.meta_data = sql_engine(engine_uri)
             self.services = _sa.Table(table_name, self.meta_data,
                                       autoload=True, autoload_with=self.engine)
             self.table_name = table_name
+            self._stmts = {}   # compiled statements - see _compiled()
         except _sa.exc.SQLAlchemyError as e:
             print e
             raise e
@@ -195,27 +224,23 @@ class service_template:
                 sys.exit(1)
 
     def __valid_utc(self):
-        return "%s.st_valid_from<=utc_timestamp() and %s.st_valid_to > utc_timestamp()" % \
-            (self.table_name, self.table_name)
-
-    def __kwarg2sel(self, **kwargs):
-        """Given a set of kwargs, convert to a select statement"""
-        a = ''
-        andp = ''
-        for k in kwargs:
-            a = a + andp + "%s.%s = \'%s\'" % (self.table_name, k, kwargs[k])
-            andp = " and "
-        return a
+        return _sa.text("%s.st_valid_from<=utc_timestamp() and %s.st_valid_to > utc_timestamp()" % \
+                        (self.table_name, self.table_name))
+
+    def __kwarg2sel(self, fields):
+        """Given a set of fields, form the where clause matching each to
+        the bound parameter "w_<field>" - see _params()"""
+        return _sa.and_(*[self.services.c[f] == _sa.bindparam('w_' + f) for f in fields])
     
     def len(self):
         """Return the number of service lines (not templates) in the database"""
-        now_t = self.__valid_utc()
         try:
-            i = self.services.count().where(now_t)
+            i = _compiled(self, ('len',), lambda: _sa.select([_sa.func.count()]).\
+                          select_from(self.services).where(self.__valid_utc()))
         except _sa.exc.SQLAlchemyError as e:
             print e
             raise
-        c = self.connection.execute(i)
+        c = sql_bind(self.engine).execute(i)
         return c.scalar()
 
     def save(self, table_name):
@@ -224,10 +249,13 @@ class service_template:
 
     def update(self, k_selection, k_update):
         """Update rows matched in k_selection with fields k_update"""
-        a = self.__kwarg2sel(**k_selection)
-        a = a + " and " + self.__valid_utc()
-        i = self.services.update().where(a).values(k_update)
-        return self.connection.execute(i)
+        fields = tuple(sorted(k_selection))
+        values = tuple(sorted(k_update))
+        i = _compiled(self, ('update', fields, values), lambda: self.services.update().\
+                      where(_sa.and_(self.__kwarg2sel(fields), self.__valid_utc())).\
+                      values(dict((f, _sa.bindparam('v_' + f)) for f in values)))
+        return sql_bind(self.engine).execute(i, _params(
+            k_selection, **dict(('v_' + f, k_update[f]) for f in values)))
 
     def add(self, **kwargs):
         """Add a new service template to the database, with the field values"""
@@ -238,26 +266,24 @@ class service_template:
         kwargs['st_valid_from'] = start_t
         kwargs['st_valid_to'] = '2038-01-01 00:00:00'
         i = self.services.insert(values=kwargs)
-        return self.connection.execute(i)
+        return sql_bind(self.engine).execute(i)
 
     def delete(self, d):
         """Delete the service template line from the database"""
         end_t = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
-        a = self.__kwarg2sel(**d)
-        i = self.services.update().where(a).values(st_valid_to=end_t)
-        return self.connection.execute(i)
+        fields = tuple(sorted(d))
+        i = _compiled(self, ('delete', fields), lambda: self.services.update().\
+                      where(self.__kwarg2sel(fields)).\
+                      values(st_valid_to=_sa.bindparam('end_t')))
+        return sql_bind(self.engine).execute(i, _params(d, end_t=end_t))
 
     def select(self, **kwargs):
         """Select a subset of services, indicated by the field/value criteria"""
-        a = self.__kwarg2sel(**kwargs)
-        andp = ''
-        if len(a):
-            andp = " and "
-        # limit searches to current records
-        a = a + andp + self.__valid_utc()
+        fields = tuple(sorted(kwargs))
         try:
-            s = self.services.select().where(a)
-            rows = self.connection.execute(s)
+            # limit searches to current records
+            s = self.__select_stmt(fields)
+            rows = sql_bind(self.engine).execute(s, _params(kwargs))
         except _sa.exc.SQLAlchemyError as e:
             print e
             raise e
@@ -267,6 +293,17 @@ class service_template:
         self._svc_groups = r
         return r
 
+    def __select_stmt(self, fields):
+        """The select of the current rows matching fields"""
+        return _compiled(self, ('select', fields), lambda: self.services.select().\
+                         where(_sa.and_(self.__kwarg2sel(fields), self.__valid_utc())))
+
+    def iter_select(self, fetch_size=SELECT_FETCH, **kwargs):
+        """Yield the rows select(**kwargs) would return, as they arrive,
+        fetch_size at a time - see bender_obj.stream_rows()"""
+        return stream_rows(sql_bind(self.engine), self.__select_stmt(tuple(sorted(kwargs))),
+                           _params(kwargs), fetch_size)
+
     def __iter__(self):
         """Return an iterator structure for moving through the
         list of services"""
@@ -298,12 +335,12 @@ class policy_group:
 
         # Open, reflect on the database to get the columns
         try:
-            self.meta_data = _sa.MetaData()
-            self.engine = _sa.create_engine(engine_uri)
-            self.connection = self.engine.connect()
+            # one engine, and pool of connections, for all of the tables
+            self.engine, self.meta_data = sql_engine(engine_uri)
             self.policies = _sa.Table(table_name, self.meta_data,
                                       autoload=True, autoload_with=self.engine)
             self.table_name = table_name
+            self._stmts = {}   # compiled statements - see _compiled()
         except _sa.exc.SQLAlchemyError as e:
             print e
             raise e
@@ -318,27 +355,23 @@ class policy_group:
                 sys.exit(1)
 
     def __valid_utc(self):
-        return "%s.p_valid_from<=utc_timestamp() and %s.p_valid_to > utc_timestamp()" % \
-            (self.table_name, self.table_name)
-
-    def __kwarg2sel(self, **kwargs):
-        """Given a set of kwargs, convert to a select statement"""
-        a = ''
-        andp = ''
-        for k in kwargs:
-            a = a + andp + "%s.%s = \'%s\'" % (self.table_name, k, kwargs[k])
-            andp = " and "
-        return a
+        return _sa.text("%s.p_valid_from<=utc_timestamp() and %s.p_valid_to > utc_timestamp()" % \
+                        (self.table_name, self.table_name))
+
+    def __kwarg2sel(self, fields):
+        """Given a set of fields, form the where clause matching each to
+        the bound parameter "w_<field>" - see _params()"""
+        return _sa.and_(*[self.policies.c[f] == _sa.bindparam('w_' + f) for f in fields])
 
     def len(self):
         """Return the number of overall members stored"""
-        now_t = self.__valid_utc()
         try:
-            i = self.policies.count().where(now_t)
+            i = _compiled(self, ('len',), lambda: _sa.select([_sa.func.count()]).\
+                          select_from(self.policies).where(self.__valid_utc()))
         except _sa.exc.SQLAlchemyError as e:
             print e
             raise
-        c = self.connection.execute(i)
+        c = sql_bind(self.engine).execute(i)
         return c.scalar()
 
     def save(self, table_name):
@@ -347,10 +380,13 @@ class policy_group:
 
     def update(self, k_selection, k_update):
         """Update rows matched in k_selection with fields k_update"""
-        a = self.__kwarg2sel(**k_selection)
-        a = a + "and " + self.__valid_utc()
-        i = self.policies.update().where(a).values(k_update)
-        return self.connection.execute(i)
+        fields = tuple(sorted(k_selection))
+        values = tuple(sorted(k_update))
+        i = _compiled(self, ('update', fields, values), lambda: self.policies.update().\
+                      where(_sa.and_(self.__kwarg2sel(fields), self.__valid_utc())).\
+                      values(dict((f, _sa.bindparam('v_' + f)) for f in values)))
+        return sql_bind(self.engine).execute(i, _params(
+            k_selection, **dict(('v_' + f, k_update[f]) for f in values)))
 
     def add(self, **kwargs):
         """Add a new policy to the database, with the field values"""
@@ -361,27 +397,25 @@ class policy_group:
         kwargs['p_valid_from'] = start_t
         kwargs['p_valid_to'] = '2038-01-01 00:00:00'
         i = self.policies.insert(values=kwargs)
-        return self.connection.execute(i)
+        return sql_bind(self.engine).execute(i)
 
     def delete(self, d):
         """Delete the policy from the database"""
         end_t = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
-        a = self.__kwarg2sel(**d)
-        i = self.policies.update().where(a).values(p_valid_to=end_t)
-        return self.connection.execute(i)
+        fields = tuple(sorted(d))
+        i = _compiled(self, ('delete', fields), lambda: self.policies.update().\
+                      where(self.__kwarg2sel(fields)).\
+                      values(p_valid_to=_sa.bindparam('end_t')))
+        return sql_bind(self.engine).execute(i, _params(d, end_t=end_t))
 
     def select(self, **kwargs):
         """Return an array of selected policy groups based on the
         arguments passed in"""
-        a = self.__kwarg2sel(**kwargs)
-        andp = ''
-        if len(a):
-            andp = " and "
-        # limit select to current records
-        a = a + andp + self.__valid_utc()
+        fields = tuple(sorted(kwargs))
         try:
-            s = self.policies.select().where(a)
-            rows = self.connection.execute(s)
+            # limit select to current records
+            s = self.__select_stmt(fields)
+            rows = sql_bind(self.engine).execute(s, _params(kwargs))
         except _sa.exc.SQLAlchemyError as e:
             print e
             raise e
@@ -391,6 +425,17 @@ class policy_group:
         self._policy_groups = r
         return r
 
+    def __select_stmt(self, fields):
+        """The select of the current rows matching fields"""
+        return _compiled(self, ('select', fields), lambda: self.policies.select().\
+                         where(_sa.and_(self.__kwarg2sel(fields), self.__valid_utc())))
+
+    def iter_select(self, fetch_size=SELECT_FETCH, **kwargs):
+        """Yield the rows select(**kwargs) would return, as they arrive,
+        fetch_size at a time - see bender_obj.stream_rows()"""
+        return stream_rows(sql_bind(self.engine), self.__select_stmt(tuple(sorted(kwargs))),
+                           _params(kwargs), fetch_size)
+
     def __iter__(self):
         """Return an iterator structure for moving through the
         list of members"""
@@ -413,12 +458,12 @@ class policy_render:
         self._sdp_fields = ()     # set of field names
 
         try:
-            self.meta_data = _sa.MetaData()
-            self.engine = _sa.create_engine(engine_uri)
-            self.connection = self.engine.connect()
+            # one engine, and pool of connections, for all of the tables
+            self.engine, self.meta_data = sql_engine(engine_uri)
             self.sdp = _sa.Table(table_name, self.meta_data,
                                         autoload=True, autoload_with=self.engine)
             self.table_name = table_name
+            self._stmts = {}   # compiled statements - see _compiled()
         except _sa.exc.SQLAlchemyError as e:
             print e
             raise e
@@ -434,27 +479,23 @@ class policy_render:
                 sys.exit(1)
 
     def __valid_utc(self):
-        return "%s.sdp_valid_from<=utc_timestamp() and %s.sdp_valid_to > utc_timestamp()" % \
-            (self.table_name, self.table_name)
-
-    def __kwarg2sel(self, **kwargs):
-        """Given a set of kwargs, convert to a select statement"""
-        a = ''
-        andp = ''
-        for k in kwargs:
-            a = a + andp + "%s.%s = \'%s\'" % (self.table_name, k, kwargs[k])
-            andp = " and "
-        return a
+        return _sa.text("%s.sdp_valid_from<=utc_timestamp() and %s.sdp_valid_to > utc_timestamp()" % \
+                        (self.table_name, self.table_name))
+
+    def __kwarg2sel(self, fields):
+        """Given a set of fields, form the where clause matching each to
+        the bound parameter "w_<field>" - see _params()"""
+        return _sa.and_(*[self.sdp.c[f] == _sa.bindparam('w_' + f) for f in fields])
 
     def len(self):
         """Return the number of rendered policy lines in the database"""
-        now_t = self.__valid_utc()
         try:
-            i = self.sdp.count().where(now_t)
+            i = _compiled(self, ('len',), lambda: _sa.select([_sa.func.count()]).\
+                          select_from(self.sdp).where(self.__valid_utc()))
         except _sa_exc.SQLAlchemyError as e:
             print e
             raise e
-        c = self.connection.execute(i)
+        c = sql_bind(self.engine).execute(i)
         return c.scalar()
 
     def save(self, table_name):
@@ -463,10 +504,13 @@ class policy_render:
 
     def update(self, k_selection, k_update):
         """Update rows matched in k_selection with fields k_update"""
-        a = self.__kwarg2sel(**k_selection)
-        a = a + "and " + self.__valid_utc()
-        i = self.sdp.update().where(a).values(k_update)
-        return self.connection.execute(i)
+        fields = tuple(sorted(k_selection))
+        values = tuple(sorted(k_update))
+        i = _compiled(self, ('update', fields, values), lambda: self.sdp.update().\
+                      where(_sa.and_(self.__kwarg2sel(fields), self.__valid_utc())).\
+                      values(dict((f, _sa.bindparam('v_' + f)) for f in values)))
+        return sql_bind(self.engine).execute(i, _params(
+            k_selection, **dict(('v_' + f, k_update[f]) for f in values)))
 
     def add(self, **kwargs):
         """Add a new SDP member to the database, with the field values"""
@@ -477,7 +521,7 @@ class policy_render:
         kwargs['sdp_valid_from'] = start_t
         kwargs['sdp_valid_to'] = '2038-01-01 00:00:00'
         i = self.sdp.insert(values=kwargs)
-        return self.connection.execute(i)
+        return sql_bind(self.engine).execute(i)
 
     def zero(self):
         """Reset/clear the rendered policy data"""
@@ -490,21 +534,73 @@ class policy_render:
     def delete(self, d):
         """Delete the SDP line from the database"""
         end_t = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
-        a = self.__kwarg2sel(**d)
-        i = self.sdp.update().where(a).values(sdp_valid_to=end_t)
-        return self.connection.execute(i)
+        fields = tuple(sorted(d))
+        i = _compiled(self, ('delete', fields), lambda: self.sdp.update().\
+                      where(self.__kwarg2sel(fields)).\
+                      values(sdp_valid_to=_sa.bindparam('end_t')))
+        return sql_bind(self.engine).execute(i, _params(d, end_t=end_t))
+
+    def __close_stmt(self, fields, nulls):
+        """The UPDATE closing the current rows matching fields, and NULL
+        in each of nulls, at the bound parameter end_t"""
+        def build():
+            where = [self.__kwarg2sel(fields), self.__valid_utc()]
+            where.extend(self.sdp.c[f] == None for f in nulls)
+            return self.sdp.update().where(_sa.and_(*where)).\
+                values(sdp_valid_to=_sa.bindparam('end_t'))
+        return _compiled(self, ('close', fields, nulls), build)
+
+    def __close_many(self, rows, end_t):
+        """Close the current rows matching each of rows on all of its
+        fields - one executemany UPDATE for the rows with the same fields"""
+        by_fields = {}
+        for row in rows:
+            fields = tuple(sorted(f for f in row if row[f] is not None))
+            nulls = tuple(sorted(f for f in row if row[f] is None))
+            by_fields.setdefault((fields, nulls), []).append(
+                _params(dict((f, row[f]) for f in fields), end_t=end_t))
+        conn = sql_bind(self.engine)
+        for (fields, nulls), params in by_fields.items():
+            conn.execute(self.__close_stmt(fields, nulls), params)
+
+    def add_many(self, rows):
+        """Add many SDP lines at once - as add() for each of rows, in one
+        transaction: the current rows matching them are closed, and the
+        rows inserted, with an executemany UPDATE and INSERT for the rows
+        with the same fields"""
+        seen = set()
+        by_fields = {}
+        for row in rows:
+            key = tuple(sorted(row.items()))
+            if not key in seen:
+                seen.add(key)
+                by_fields.setdefault(tuple(sorted(row)), []).append(row)
+        if not by_fields:
+            return
+        start_t = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        with transaction(self):
+            for f_rows in by_fields.values():
+                self.__close_many(f_rows, start_t)
+                sql_bind(self.engine).execute(self.sdp.insert(), [
+                    dict(row, sdp_valid_from=start_t,
+                         sdp_valid_to='2038-01-01 00:00:00') for row in f_rows])
+
+    def delete_many(self, rows):
+        """Delete (close) the current SDP lines matching each of rows, in
+        one transaction - see add_many()"""
+        rows = list(rows)
+        if not rows:
+            return
+        with transaction(self):
+            self.__close_many(rows, time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()))
 
     def select(self, **kwargs):
         """Select the SDP sets, indicated by the field/value criteria"""
-        a = self.__kwarg2sel(**kwargs)
-        andp = ''
-        if len(a):
-            andp = " and "
-        # limit selects to current records
-        a = a + andp + self.__valid_utc()
+        fields = tuple(sorted(kwargs))
         try:
-            s = self.sdp.select().where(a)
-            rows = self.connection.execute(s)
+            # limit selects to current records
+            s = self.__select_stmt(fields)
+            rows = sql_bind(self.engine).execute(s, _params(kwargs))
         except _sa.exc.SQLAlchemyError as e:
             print e
             raise e
@@ -514,6 +610,17 @@ class policy_render:
         self._sdp_groups = r
         return r
 
+    def __select_stmt(self, fields):
+        """The select of the current rows matching fields"""
+        return _compiled(self, ('select', fields), lambda: self.sdp.select().\
+                         where(_sa.and_(self.__kwarg2sel(fields), self.__valid_utc())))
+
+    def iter_select(self, fetch_size=SELECT_FETCH, **kwargs):
+        """Yield the rows select(**kwargs) would return, as they arrive,
+        fetch_size at a time - see bender_obj.stream_rows()"""
+        return stream_rows(sql_bind(self.engine), self.__select_stmt(tuple(sorted(kwargs))),
+                           _params(kwargs), fetch_size)
+
     def __iter__(self):
         """Return an iterator structure for moving through the list of members"""
         return list.__iter__(self._sdp_groups)
@@ -8,36 +8,26 @@ extensible to use more conventional databases.
 """
 
 import bender_obj as bender
-import socket
+import bender_render
+import bender_resolve
 
 from flask import Flask, request, url_for, render_template, redirect
 
 b_ui = Flask(__name__, static_url_path='/static')
 
-# Load the demo databases from mock data
-hg = bender.host_group('csv://mockdata/mock-hostdb.csv','hostgroups')
-sg = bender.service_template('csv://mockdata/mock-svcdb.csv','service_templates')
-pg = bender.policy_group('csv://mockdata/mock-poldb.csv', 'policy')
-sdp = bender.policy_render('csv://mockdata/mock-sdpdb.csv', 'sdp')
-
-# gethostaddr - similar to socket.gethostbyname() - but use getaddrinfo() to deal
-# with IPv6 addresses
-def gethostaddr(name):
-    # a _very_ bad way to if name is an IP address or IP network (v4 or v6)
-    s = name
-    if s.strip('0123456789/.:abcdefABCDEF') == '':
-        return name  # _probably_ an IPv4 or IPv6 address or network
-    try:
-        h_infos = socket.getaddrinfo(name,None,0,0,socket.SOL_TCP)
-    except socket.gaierror as e:
-        e_msg = stocket.gai_strerror(e)
-        print "bender.gethostaddr(name):", e_msg
-        errors = errors + errors_nl + e_msg
-        errors_nl = '\r\n'
-        raise e
-    # go for the first item returned in the array
-    # print "Name",name,"address",h_infos[0][4][0]
-    return h_infos[0][4][0]
+# Load the demo databases from mock data; saves append the changes to a
+# journal next to each file, rather than rewriting it, and a binary
+# snapshot of each file saves parsing it at the next start
+hg = bender.host_group('csv://mockdata/mock-hostdb.csv?journal&snapshot','hostgroups')
+sg = bender.service_template('csv://mockdata/mock-svcdb.csv?journal&snapshot',
+                             'service_templates')
+pg = bender.policy_group('csv://mockdata/mock-poldb.csv?journal&snapshot', 'policy')
+sdp = bender.policy_render('csv://mockdata/mock-sdpdb.csv?journal&snapshot', 'sdp')
+
+# policies that need re-rendering after edits
+deps = bender_render.render_deps()
+# member lookups - see [resolver] in sample_bender.cf
+resolver = bender_resolve.resolver_from_config(['/etc/bender.cf', 'bender.cf'])
 
 @b_ui.route('/index')
 @b_ui.route('/')
@@ -74,6 +64,7 @@ def delete_group():
     dg = hg.select(hg_name=g)
     for d in dg:
         hg.delete(d)
+    deps.touch_hostgroup(g)
     return redirect(url_for('index_hostgroups'))
 
 @b_ui.route('/delmember', methods=['POST'])
@@ -87,6 +78,7 @@ def delete_member():
     print "Web: delete member ", m, "returned", dm
     for m in dm:
         hg.delete(m)
+    deps.touch_hostgroup(g)
     return redirect(url_for('index_hostgroups'))
 
 @b_ui.route('/addgroup', methods=['POST'])
@@ -101,6 +93,7 @@ def add_group():
         return redirect(url_for('index_hostgroups'))
     print "Web: add member", m, "to group", g
     hg.add(hg_name=g, hg_member=m, hg_type=t, hg_owner=o, hg_rp=r)
+    deps.touch_hostgroup(g)
     return redirect(url_for('index_hostgroups')+"#groups")
 
 @b_ui.route('/savegroup', methods=['POST'])
@@ -119,6 +112,7 @@ def delete_service():
     sl = sg.select(st_name=sname)
     for s in sl:
         sg.delete(s)
+    deps.touch_template(sname)
     return redirect(url_for('index_hostgroups')+"#services")
 
 @b_ui.route('/deletesvcline', methods=['POST'])
@@ -135,6 +129,7 @@ def delete_service_line():
                    st_rp=request.form['rp'])
     for s in sl:
         sg.delete(s)
+    deps.touch_template(lname)
     return redirect(url_for('index_hostgroups')+"#services")
 
 @b_ui.route('/addservice', methods=['POST'])
@@ -148,6 +143,7 @@ def add_service():
     rp = request.form['rp']
     sg.add(st_name=name, st_port=port, st_protocol=protocol, st_bidir=bidir,
            st_transport=transport, st_owner=owner, st_rp=rp)
+    deps.touch_template(name)
     return redirect(url_for('index_hostgroups')+"#services")
 
 @b_ui.route('/saveservice', methods=['POST'])
@@ -168,6 +164,7 @@ def delete_policy_line():
                      p_destination=destination, p_template=template)
     for d in dpol:
         pg.delete(d)
+    deps.touch_policy(name)
     return redirect(url_for('index_hostgroups')+"#policies")
 
 @b_ui.route('/delpolicy', methods=['POST'])
@@ -176,6 +173,7 @@ def delete_policy():
     dpol = pg.select(p_name=name)
     for d in dpol:
         pg.delete(d)
+    deps.touch_policy(name)
     return redirect(url_for('index_hostgroups')+"#policies")
 
 @b_ui.route('/addpolicy', methods=['POST'])
@@ -188,6 +186,7 @@ def add_policy():
                 p_source=source,
                 p_destination=destination,
                 p_template=template)
+    deps.touch_policy(name)
     return redirect(url_for('index_hostgroups')+"#policies")
 
 @b_ui.route('/savepolicy', methods=['POST'])
@@ -200,38 +199,26 @@ def save_policy():
 #####################################################
 @b_ui.route('/rendersdp', methods=['POST'])
 def render_sdp():
-    # Generate all policies
-    #   for all policies
-    #           for all hosts in the policy source host group
-    #             for all hosts in the policy destination host group
-    #                 for all services in the service template
-    #                   save the source,destination,port information
-    for p in pg:
-        for src in hg.select(hg_name=p['p_source']):
-            for dst in hg.select(hg_name=p['p_destination']):
-                for svc in sg.select(st_name=p['p_template']):
-                    name = "%s_%s_%s" % (src['hg_name'], dst['hg_name'], svc['st_name'])
-                    try:
-                        source_ip = gethostaddr(src['hg_member'])
-                        destination_ip = gethostaddr(dst['hg_member'])
-                    except:
-                        print "Error looking up", src['hg_member'], "or", dst['hg_member']
-                        continue  # just skip it?
-                    if src['hg_member'] != dst['hg_member']:
-                        # print "\tSDP Add:", src['hg_member'], "and", dst['hg_member'], "for", svc['st__name']
-                        sdp.add(sdp_group=p['p_name'], sdp_name=name,
-                                sdp_source=src['hg_member'], sdp_source_ip=source_ip,
-                                sdp_destination=dst['hg_member'],
-                                sdp_destination_ip=destination_ip,
-                                sdp_bidir=svc['st_bidir'], sdp_port=svc['st_port'],
-                                sdp_protocol=svc['st_protocol'])
-    sdp.save('mockdata/mock-sdpdb.csv')
+    # Re-generate the policies touched since the last render - see
+    # bender_render for how the host groups, service templates and
+    # policies are expanded.  The changes to sdp are made as one unit of
+    # work, saved (or committed) once at the end
+    changes = {}
+    with bender.transaction(sdp):
+        errors = bender_render.render_sdp(hg, sg, pg, sdp, resolve=resolver, deps=deps,
+                                          changes=changes)
+    for e_msg in errors:
+        print e_msg
+    print "SDP: %d added, %d removed; resolver %s" % \
+        (len(changes['add']), len(changes['remove']), resolver.stats())
+    resolver.save()
     return redirect(url_for('index_hostgroups')+"#renderedpolicies")
 
 @b_ui.route('/resetsdp', methods=['POST'])
 def reset_sdp():
     # just erase the whole thing - usually done prior to a full recompute
     sdp.zero()
+    deps.touch_all()
     sdp.save('mockdata/mock-sdpdb.csv')
     return redirect(url_for('index_hostgroups')+"#renderedpolicies")
 
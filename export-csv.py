@@ -0,0 +1,28 @@
+#!/usr/bin/python
+#
+# Write a bender table as CSV (with a header line) to stdout, from the
+# database named in bender.cf - the rows are read a batch at a time, so a
+# large table (sdp) needn't fit in memory
+
+import sys
+import csv
+import bender_obj as bender
+
+tables = {'hostgroups': bender.host_group,
+          'service_templates': bender.service_template,
+          'policy': bender.policy_group,
+          'sdp': bender.policy_render}
+
+if len(sys.argv) < 2 or sys.argv[1] not in tables:
+    print "Usage: export-csv <%s>" % ('|'.join(sorted(tables)))
+    sys.exit(1)
+
+pol_db_cfg = bender.read_config("database", ['/etc/bender.cf', 'bender.cf'])
+table = tables[sys.argv[1]](pol_db_cfg['uri'], sys.argv[1])
+
+dictw = csv.DictWriter(sys.stdout, table.fields(), lineterminator='\n')
+dictw.writeheader()
+for row in table.iter_select():
+    # the csv module writes byte strings
+    dictw.writerow(dict((k, v.encode('utf-8') if isinstance(v, unicode) else v)
+                        for k, v in row.iteritems()))
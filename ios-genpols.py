@@ -32,7 +32,7 @@ if len(policy_lines) == 0:
 last_name = ''
 output_in = ""     # buffered output for "in" policy
 output_out = ""   # buffered output for "out" policy
-for sdp in sdp_groups.select(sdp_group=policy):
+for sdp in sdp_groups.iter_select(sdp_group=policy):
     if sdp['sdp_name'] != last_name:
         # print out buffered policy
         if not output_out == "":
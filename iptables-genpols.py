@@ -3,25 +3,46 @@
 # Simple version
 # Generate IPTables access list - suitable for hooking onto INPUT and OUTPUT policies
 #
-# This uses the pre-generated "SDP" tables to generate
+# This uses the pre-generated "SDP" tables to generate, or with --render,
+# renders the policy on the fly (without storing the SDP rows)
 
 import sys
+import itertools
 import bender_obj as bender
+import bender_render
+import bender_resolve
+
+render = len(sys.argv) > 1 and sys.argv[1] == '--render'
+if render:
+    sys.argv.pop(1)
 
 if len(sys.argv) < 2:
-    print "Usage: iptable-genpol <policy name>"
+    print "Usage: iptable-genpol [--render] <policy name>"
     sys.exit(1)
 
 sdp_group = sys.argv[1]
 
 pol_db_cfg = bender.read_config("database", ['/etc/bender.cf', 'bender.cf'])
 
-sdp_entries = bender.policy_render(pol_db_cfg['uri'], 'sdp')
+if render:
+    errors = []
+    sdp_lines = bender_render.iter_sdp(
+        bender.host_group(pol_db_cfg['uri'], 'hostgroups'),
+        bender.service_template(pol_db_cfg['uri'], 'service_templates'),
+        bender.policy_group(pol_db_cfg['uri'], 'policy'),
+        resolve=bender_resolve.resolver_from_config(['/etc/bender.cf', 'bender.cf']),
+        groups=[sdp_group], errors=errors)
+else:
+    sdp_entries = bender.policy_render(pol_db_cfg['uri'], 'sdp')
+    sdp_lines = sdp_entries.iter_select(sdp_group=sdp_group)
 
-sdp_lines = sdp_entries.select(sdp_group=sdp_group)
-if len(sdp_lines) == 0:
+# peek at the first line, so we needn't have them all in hand
+try:
+    first_line = next(iter(sdp_lines))
+except StopIteration:
     print "Nothing in group", sys.argv[1]
     sys.exit(1)
+sdp_lines = itertools.chain([first_line], sdp_lines)
 
 def uniq_values(listv, key):
     seen = set()
@@ -74,10 +95,14 @@ fi
 """ % (sdp_group)
 
 for line in sdp_lines:
-    print "iptables -A %s --source %s --protocol %s --sport %d --destination %s --jump ACCEPT"\
+    print "iptables -A %s --source %s --protocol %s --sport %s --destination %s --jump ACCEPT"\
         % (sdp_group, line['sdp_source_ip'], line['sdp_protocol'], line['sdp_port'],  \
          line['sdp_destination_ip'])
 
 # print iptables "end rules" - default drop
 print "iptables -A INPUT -j default_drop"
 
+if render:
+    for e_msg in errors:
+        print >>sys.stderr, e_msg
+